@@ -11,8 +11,6 @@ class AlphaZeroAgent(DRLAgent):
         if self.team == Team.red:
             state.flip_teams()
 
-        self.model.to(self.device)  # no-op if already on correct device
-
         state_tensor = self.state_to_tensor(state)
         policy, _ = self.model.predict(state_tensor)
 
@@ -22,6 +22,7 @@ from stratego.core import (
     Move,
     Position,
     Piece,
+    Obstacle,
     ActionMap,
     Action,
     InfoBoard,
@@ -102,7 +103,19 @@ class RLAgent(Agent, ABC):
         self.representation = representation
 
         self.reward = 0
-        self.reward_map: Dict[RewardToken, float] = reward_map
+        self.reward_map = reward_map
+
+    @property
+    def reward_map(self) -> Dict[RewardToken, float]:
+        return self._reward_map
+
+    @reward_map.setter
+    def reward_map(self, reward_map: Dict[RewardToken, float]):
+        self._reward_map = reward_map
+        # the same rewards indexed by the reward token values (0 for unmapped tokens)
+        self.reward_vec = np.zeros(len(RewardToken), dtype=np.float64)
+        for token, reward in reward_map.items():
+            self.reward_vec[token] = reward
 
     def sample_action(
         self,
@@ -190,7 +203,7 @@ class RLAgent(Agent, ABC):
         return self.rng.choice(self.action_map.actions, p=prob)
 
     def add_reward(self, reward_token: RewardToken):
-        self.reward += self.reward_map[reward_token]
+        self.reward += self.reward_vec[reward_token]
 
 
 class DRLAgent(RLAgent, ABC):
@@ -213,7 +226,8 @@ class DRLAgent(RLAgent, ABC):
             representation=representation,
             reward_map=reward_map
         )
-        self.model = model
+        # the model is placed on its device once, the inputs are moved there by the model itself.
+        self.model = model.to(device)
         self.device = device
 
     def state_to_tensor(
@@ -307,26 +321,29 @@ class MCAgent(Agent, ABC):
         """
         # get information about enemy pieces (how many, which alive, which types, and indices in assign. array)
         board = Board(copy.deepcopy(self.info_board))
-        tokens = copy.deepcopy(self.specs.token_count)
         version_table = defaultdict(list)
         for piece in self.identified_pieces:
-            tokens[piece.token] -= 1
             version_table[piece.token].append(piece.version)
+        # the (token, version) of every enemy piece, that has not been identified yet
+        unidentified = [
+            (token, version)
+            for token, freq in self.specs.token_count.items()
+            for version in range(1, freq + 1)
+            if version not in version_table[token]
+        ]
 
         enemy_pieces_to_assign = [
             piece
             for piece in board.flatten()
-            if piece.team == self.team.opponent() and piece.hidden
+            if piece is not None
+            and not isinstance(piece, Obstacle)
+            and piece.team == self.team.opponent()
+            and piece.hidden
         ]
-        # place this draw now on the board by assigning the tokens
-        for piece in enemy_pieces_to_assign:
-            drawn_token = self.rng.choice(list(tokens.keys()))
-            if tokens[drawn_token] == 1:
-                tokens.pop(drawn_token)
-            version = 0
-            while version in version_table[drawn_token]:
-                version += 1
-            board[piece.position] = Piece(
-                piece.position, piece.team, drawn_token, version=version
-            )
+        # place this draw now on the board by assigning the tokens of a single permutation
+        for piece, idx in zip(
+            enemy_pieces_to_assign, self.rng.permutation(len(unidentified))
+        ):
+            token, version = unidentified[idx]
+            board[piece.position] = Piece(piece.position, piece.team, token, version)
         return board
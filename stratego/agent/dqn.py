@@ -23,8 +23,6 @@ class DQNAgent(DRLAgent):
         if self.team == Team.red:
             state.flip_teams()
 
-        self.model.to(self.device)  # no-op if already on correct device
-
         q_values = self.q_values(state)
 
         action = self.sample_action(q_values, mode=PolicyMode.greedy)
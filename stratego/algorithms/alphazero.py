@@ -17,6 +17,7 @@ from stratego.agent import AlphaZeroAgent
 from copy import deepcopy
 
 import torch
+import torch.nn.functional as F
 from torch.utils.data import DataLoader, TensorDataset
 from torch import optim
 import numpy as np
@@ -225,7 +226,9 @@ class AlphaZeroAlgorithm(DeepLearningAlgorithm):
                 folder=self.model_folder, filename="temp.pth.tar"
             )
 
-            self.train(selfplay_data, n_epochs, batch_size=batch_size, device=device)
+            self.train(
+                selfplay_data_tensors, n_epochs, batch_size=batch_size, device=device
+            )
 
             print("\nPITTING AGAINST PREVIOUS VERSION")
 
@@ -246,7 +249,9 @@ class AlphaZeroAlgorithm(DeepLearningAlgorithm):
             else:
                 print("ACCEPTING NEW MODEL\n")
                 model.save_checkpoint(
-                    folder=self.model_folder, filename=f"checkpoint_{i}.pth.tar"
+                    folder=self.model_folder,
+                    filename=f"checkpoint_{i}.pth.tar",
+                    half_precision=True,
                 )
 
     def generate_selfplay_data(
@@ -309,55 +314,94 @@ class AlphaZeroAlgorithm(DeepLearningAlgorithm):
                 append(self.selfplay_episode(mcts, memory_capacity=memory_capacity))
 
     def train(
-        self, replays: Experience, epochs: int, batch_size: int, device: str
+        self,
+        replays: Experience,
+        epochs: int,
+        batch_size: int,
+        device: str,
+        amp: bool = True,
+        num_workers: int = 0,
+        log_every: int = 50,
     ):
         """
-        examples: list of examples, each example is of form (board, pi, v)
+        replays: the examples, each of the form (board tensor, pi, v, player)
+
+        With 'amp', the forward pass and losses run under mixed precision autocast (float16 with
+        gradient scaling on cuda, bfloat16 on cpu).
+        The data loader is built once for all epochs. Its 'num_workers' default to 0, since the
+        examples are already held in memory and workers would only add inter-process copies.
+        The running losses are read off the device (a sync point) only every 'log_every' batches.
         """
         model = self.student.model
         optimizer = optim.Adam(model.parameters())
-        for _ in tqdm(range(epochs), desc="Training epoch"):
-            model.run()
-            pi_losses = utils.RollingMeter()
-            v_losses = utils.RollingMeter()
-
-            data_loader = DataLoader(
-                TensorDataset(replays.memory), batch_size=batch_size
-            )
-            batch_bar = tqdm(data_loader)
-            for batch_idx, batch in enumerate(data_loader):
-                boards, pis, vs, _ = batch
-
-                boards = torch.cat(boards).to(device)
-                target_pis = torch.tensor(np.array(pis), device=device)
-                target_vs = torch.tensor(np.array(vs).astype(np.float64), device=device)
+        device_type = torch.device(device).type
+        amp_dtype = torch.float16 if device_type == "cuda" else torch.bfloat16
+        # float16 gradients may underflow without scaling, bfloat16 has the range of float32
+        scaler = torch.amp.GradScaler(device_type, enabled=amp and device_type == "cuda")
+        # stack the examples once, so that the batches are mere slices of these tensors
+        boards_all = torch.cat([entry.state for entry in replays]).float()
+        pis_all = torch.as_tensor(
+            np.stack([entry.pi for entry in replays]), dtype=torch.float32
+        )
+        vs_all = torch.as_tensor(
+            np.asarray([entry.value for entry in replays]), dtype=torch.float32
+        )
+        # pinned host memory lets the copies to the gpu run asynchronously
+        data_loader = DataLoader(
+            TensorDataset(boards_all, pis_all, vs_all),
+            batch_size=batch_size,
+            shuffle=True,
+            num_workers=num_workers,
+            pin_memory=device_type == "cuda",
+            persistent_workers=num_workers > 0,
+        )
+        model.train()
+        epoch_bar = tqdm(range(epochs), desc="Training epoch")
+        for _ in epoch_bar:
+            # the losses are summed up on the device, reading them out is a sync point
+            pi_loss_sum = torch.zeros((), device=device)
+            v_loss_sum = torch.zeros((), device=device)
+            n_examples = 0
+
+            for batch_idx, (boards, target_pis, target_vs) in enumerate(data_loader):
+                boards = model.to_channels_last(boards.to(device, non_blocking=True))
+                target_pis = target_pis.to(device, non_blocking=True)
+                target_vs = target_vs.to(device, non_blocking=True)
                 # compute output
-                out_pi, out_v = model(boards)
-                l_pi = self.loss_pi(target_pis, out_pi)
-                l_v = self.loss_v(target_vs, out_v)
-                total_loss = l_pi + l_v
+                with torch.autocast(device_type, dtype=amp_dtype, enabled=amp):
+                    out_pi, out_v = model(boards)
+                    l_pi = self.loss_pi(target_pis, out_pi)
+                    l_v = self.loss_v(target_vs, out_v)
+                    total_loss = l_pi + l_v
 
                 # record loss
-                pi_losses.push(l_pi.item(), boards.size(0))
-                v_losses.push(l_v.item(), boards.size(0))
+                pi_loss_sum += l_pi.detach() * boards.size(0)
+                v_loss_sum += l_v.detach() * boards.size(0)
+                n_examples += boards.size(0)
 
                 # compute gradient and do SGD step
-                optimizer.zero_grad()
-                total_loss.backward()
-                optimizer.step()
+                optimizer.zero_grad(set_to_none=True)
+                scaler.scale(total_loss).backward()
+                scaler.step(optimizer)
+                scaler.update()
 
                 # plot progress
-                batch_bar.set_description(
-                    "Loss_pi: {lpi:.4f} | Loss_v: {lv:.3f}".format(
-                        lpi=pi_losses.avg,
-                        lv=v_losses.avg,
+                if (batch_idx + 1) % log_every == 0 or batch_idx + 1 == len(data_loader):
+                    epoch_bar.set_postfix_str(
+                        "Loss_pi: {lpi:.4f} | Loss_v: {lv:.3f}".format(
+                            lpi=pi_loss_sum.item() / n_examples,
+                            lv=v_loss_sum.item() / n_examples,
+                        )
                     )
-                )
+        # predictions run in eval mode, which the model stays in until the next training run
+        model.eval()
 
     @classmethod
     def loss_pi(cls, targets, outputs):
-        return -torch.sum(targets * outputs) / targets.size()[0]
+        # the outputs are log-probabilities. The KL divergence differs from the cross entropy
+        # only by the (constant) entropy of the targets, hence has the same gradients.
+        return F.kl_div(outputs, targets, reduction="batchmean")
 
     @classmethod
     def loss_v(cls, targets, outputs):
-        return torch.sum((targets - outputs.view(-1)) ** 2) / targets.size()[0]
+        return F.mse_loss(outputs.squeeze(-1), targets)
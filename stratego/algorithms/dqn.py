@@ -219,8 +219,12 @@ class DQNAlgorithm(DeepLearningAlgorithm):
         )  # compute Huber loss
 
         # optimize network
-        optimizer.zero_grad()  # optimize towards expected q-values
+        # dropping the gradients saves a pass of zeroing them, backward writes them anew
+        optimizer.zero_grad(set_to_none=True)  # optimize towards expected q-values
         loss.backward()
         for param in model.parameters():
-            param.grad.data.clamp_(-1, 1)
+            if param.grad is not None:
+                param.grad.data.clamp_(-1, 1)
         optimizer.step()
+        # back to eval mode for the agent's action selection
+        model.eval()
@@ -81,7 +81,7 @@ class MCTS:
             # ensure the chosen perspective is seen as team blue
             state.flip_teams()
 
-        s = str(state)
+        s = self._state_key(state)
 
         counts = np.array(
             [
@@ -135,8 +135,8 @@ class MCTS:
             if state.active_team == Team.red:
                 # the network is trained only from the perspective of team blue
                 state.flip_teams()
-            # get string representation of state
-            s = str(state)
+            # get the string key of the state
+            s = self._state_key(state)
 
             if (state.active_team == perspective) == state.flipped_teams:
                 # adjust for the correct perspective:
@@ -216,8 +216,8 @@ class MCTS:
         if state.active_team == Team.red:
             # the network is trained only from the perspective of team blue
             state.flip_teams()
-        # get string representation of state
-        s = str(state)
+        # get the string key of the state
+        s = self._state_key(state)
 
         if s not in self.Es:
             self.Es[s] = logic.get_status(state)
@@ -246,6 +246,17 @@ class MCTS:
 
         return -value
 
+    @staticmethod
+    def _state_key(state: State) -> str:
+        # the exact content of every field (including the pieces' versions and hidden flags),
+        # the turn and the active team
+        board = state.board
+        planes = (board.tokens, board.teams, board.versions, board.flags)
+        return (
+            f"{state.turn_counter}:{state.active_team.value}:"
+            f"{b''.join(plane.tobytes() for plane in planes).hex()}"
+        )
+
     def _update_qsa(self, s: str, a: int, value: float):
         s_a = (s, a)
         if s_a in self.Qsa:
@@ -7,9 +7,11 @@ from .game_defs import (
     Token,
     Status,
     MAX_NR_TURNS,
+    NR_TOKENS,
     BattleMatrix,
     GameSpecification,
     HookPoint,
 )
 from .position import Position, Move
 from .action import Action, ActionMap
+from .transposition import TranspositionTable, KillerMoves, Bound
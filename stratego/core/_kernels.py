@@ -0,0 +1,271 @@
+"""
+Compiled kernels of the game logic operating on the integer planes of a Board.
+
+The kernels are plain integer code with explicit loops, which numba compiles to native code.
+If numba is not installed, they run as regular python functions.
+"""
+import numpy as np
+
+from .game_defs import Token, Status, NR_TOKENS
+from .board import EMPTY, UNKNOWN, HIDDEN, MOVED
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+# the return value of 'do_move_nb' if the move did not lead to a fight
+NO_FIGHT = 2
+
+_FLAG = Token.flag.value
+_BOMB = Token.bomb.value
+_SCOUT = Token.scout.value
+_OBSTACLE = Token.obstacle.value
+_WIN_BLUE = Status.win_blue.value
+_WIN_RED = Status.win_red.value
+_TIE = Status.tie.value
+_ONGOING = Status.ongoing.value
+
+
+@njit(cache=True, nogil=True)
+def _field_key(zobrist, tokens, teams, flags, r, c):
+    token = tokens[r, c]
+    if token == EMPTY or token == _OBSTACLE:
+        return np.uint64(0)
+    if token == UNKNOWN:
+        token = NR_TOKENS
+    return zobrist[
+        token,
+        teams[r, c],
+        r * tokens.shape[1] + c,
+        flags[r, c] & HIDDEN,
+        (flags[r, c] & MOVED) >> 1,
+    ]
+
+
+@njit(cache=True, nogil=True)
+def _move_field(tokens, teams, versions, flags, from_r, from_c, to_r, to_c):
+    tokens[to_r, to_c] = tokens[from_r, from_c]
+    teams[to_r, to_c] = teams[from_r, from_c]
+    versions[to_r, to_c] = versions[from_r, from_c]
+    flags[to_r, to_c] = flags[from_r, from_c]
+    _clear_field(tokens, teams, versions, flags, from_r, from_c)
+
+
+@njit(cache=True, nogil=True)
+def _clear_field(tokens, teams, versions, flags, r, c):
+    tokens[r, c] = EMPTY
+    teams[r, c] = EMPTY
+    versions[r, c] = 0
+    flags[r, c] = 0
+
+
+@njit(cache=True, nogil=True)
+def do_move_nb(
+    tokens,
+    teams,
+    versions,
+    flags,
+    bm,
+    zobrist,
+    zobrist_key,
+    from_r,
+    from_c,
+    to_r,
+    to_c,
+    dead0,
+    dead1,
+):
+    """
+    Execute the move (from_r, from_c) -> (to_r, to_c) on the planes and count the killed pieces
+    in the dead pieces arrays of team blue (dead0) and red (dead1). The board's Zobrist key
+    (a single element array) is updated in place. The move is expected to be legal.
+
+    Returns
+    -------
+    int,
+        the fight outcome from the attacker's perspective (1 win, 0 tie, -1 loss)
+        or NO_FIGHT if the target field was empty.
+    """
+    # take both fields out of the key and put them back in after the move
+    zobrist_key[0] ^= _field_key(zobrist, tokens, teams, flags, from_r, from_c)
+    zobrist_key[0] ^= _field_key(zobrist, tokens, teams, flags, to_r, to_c)
+    outcome = _do_move(
+        tokens, teams, versions, flags, bm, from_r, from_c, to_r, to_c, dead0, dead1
+    )
+    zobrist_key[0] ^= _field_key(zobrist, tokens, teams, flags, from_r, from_c)
+    zobrist_key[0] ^= _field_key(zobrist, tokens, teams, flags, to_r, to_c)
+    return outcome
+
+
+@njit(cache=True, nogil=True)
+def _do_move(
+    tokens, teams, versions, flags, bm, from_r, from_c, to_r, to_c, dead0, dead1
+):
+    flags[from_r, from_c] |= MOVED
+    defender = tokens[to_r, to_c]
+    if defender == EMPTY:
+        _move_field(tokens, teams, versions, flags, from_r, from_c, to_r, to_c)
+        return NO_FIGHT
+
+    # a fight reveals both pieces
+    flags[from_r, from_c] &= ~HIDDEN
+    flags[to_r, to_c] &= ~HIDDEN
+    attacker = tokens[from_r, from_c]
+    outcome = bm[attacker, defender]
+    if outcome >= 0:
+        # the defender dies
+        if teams[to_r, to_c] == 0:
+            dead0[defender] += 1
+        else:
+            dead1[defender] += 1
+    if outcome <= 0:
+        # the attacker dies
+        if teams[from_r, from_c] == 0:
+            dead0[attacker] += 1
+        else:
+            dead1[attacker] += 1
+
+    if outcome == 1:
+        # attacker moves onto the defender's field
+        _move_field(tokens, teams, versions, flags, from_r, from_c, to_r, to_c)
+    elif outcome == 0:
+        # mutual annihilation
+        _clear_field(tokens, teams, versions, flags, from_r, from_c)
+        _clear_field(tokens, teams, versions, flags, to_r, to_c)
+    else:
+        # the defender stays
+        _clear_field(tokens, teams, versions, flags, from_r, from_c)
+    return outcome
+
+
+@njit(cache=True, nogil=True)
+def scan_board_nb(tokens, teams):
+    """
+    Gather all per-step board statistics in a single pass over the planes.
+
+    Returns
+    -------
+    tuple,
+        the piece count per (team, token) as (2, NR_TOKENS) array (unknown pieces excluded) and
+        whether each team has at least one legal move as (2,) array.
+
+    Notes
+    -----
+    Every legal move (scout moves included) starts with a step onto a 4-adjacent field,
+    which is either empty or held by the opponent.
+    """
+    n_rows, n_cols = tokens.shape
+    counts = np.zeros((2, NR_TOKENS), dtype=np.int64)
+    has_moves = np.zeros(2, dtype=np.bool_)
+    for r in range(n_rows):
+        for c in range(n_cols):
+            team = teams[r, c]
+            if team == EMPTY:
+                continue
+            token = tokens[r, c]
+            if token != UNKNOWN:
+                counts[team, token] += 1
+            if has_moves[team] or token == _FLAG or token == _BOMB:
+                continue
+            for dr, dc in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                nr = r + dr
+                nc = c + dc
+                if 0 <= nr < n_rows and 0 <= nc < n_cols:
+                    if teams[nr, nc] != team and tokens[nr, nc] != _OBSTACLE:
+                        has_moves[team] = True
+                        break
+    return counts, has_moves
+
+
+@njit(cache=True, nogil=True)
+def legal_moves_nb(tokens, teams, team, rays):
+    """
+    Enumerate the legal moves of the team by walking the precomputed rays of its pieces.
+
+    Parameters
+    ----------
+    rays: np.ndarray,
+        the ray table of the board size (see 'game_defs.ray_table').
+
+    Returns
+    -------
+    np.ndarray,
+        the (from square, to square) flat index pairs of all legal moves as (N, 2) array.
+        Ordered by position, then direction, then distance.
+    """
+    n_cols = tokens.shape[1]
+    moves = np.empty((rays.shape[0] * rays.shape[1] * rays.shape[2], 2), dtype=np.int64)
+    n = 0
+    for square in range(rays.shape[0]):
+        r = square // n_cols
+        c = square % n_cols
+        if teams[r, c] != team:
+            continue
+        token = tokens[r, c]
+        if token == _FLAG or token == _BOMB:
+            continue
+        # unknown pieces could be scouts
+        reach = rays.shape[2] if token == _SCOUT or token == UNKNOWN else 1
+        for d in range(rays.shape[1]):
+            for k in range(reach):
+                target = rays[square, d, k]
+                if target < 0:
+                    break
+                tr = target // n_cols
+                tc = target % n_cols
+                if tokens[tr, tc] == _OBSTACLE or teams[tr, tc] == team:
+                    break
+                moves[n, 0] = square
+                moves[n, 1] = target
+                n += 1
+                if teams[tr, tc] != EMPTY:
+                    # an opponent piece blocks the fields behind it
+                    break
+    return moves[:n]
+
+
+@njit(cache=True, nogil=True)
+def _is_defeated(dead, token_count):
+    if dead[_FLAG] == token_count[_FLAG]:
+        return True
+    for token in range(token_count.shape[0]):
+        if token == _FLAG or token == _BOMB:
+            continue
+        if dead[token] != token_count[token]:
+            # a move-able piece is still alive
+            return False
+    return True
+
+
+@njit(cache=True, nogil=True)
+def check_terminal_nb(
+    has_moves, dead0, dead1, token_count, turn_counter, max_nr_turns
+):
+    """
+    Compute the status value of the game.
+
+    Parameters
+    ----------
+    has_moves: np.ndarray,
+        whether each team has a legal move left, as returned by 'scan_board_nb'.
+
+    Returns
+    -------
+    int,
+        the value of the corresponding Status enum member.
+    """
+    if _is_defeated(dead0, token_count):
+        return _WIN_RED
+    if _is_defeated(dead1, token_count):
+        return _WIN_BLUE
+    if turn_counter >= max_nr_turns:
+        return _TIE
+    if not has_moves[0] or not has_moves[1]:
+        return _TIE
+    return _ONGOING
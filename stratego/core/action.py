@@ -7,8 +7,8 @@ from .board import Board
 from .logic import Logic
 from .piece import Piece
 
-from typing import Tuple, Dict, Union, List, Iterator
-from functools import singledispatchmethod
+from typing import Tuple, Dict, Union, List
+from functools import singledispatchmethod, lru_cache
 import numpy as np
 
 
@@ -57,14 +57,77 @@ class Action:
         return self.actor == other.actor and self.effect == other.effect
 
 
+@lru_cache(maxsize=None)
+def build_action_map(game_size: int, token_count: Tuple[Tuple[Token, int], ...]):
+    """
+    Build the action representation for the given game size and token count.
+    The result is cached, so that it is computed only once per process for each game specification.
+
+    Parameters
+    ----------
+    game_size: int,
+        the length of the board.
+    token_count: Tuple[Tuple[Token, int], ...],
+        the (token, frequency) pairs of the game specification (hashable for caching).
+
+    Returns
+    -------
+    tuple,
+        the actions, the inverse action map, the actor to actions map, the actor to action
+        indices map and the action effects as (N, 2) int8 array.
+    """
+    # every movable token is given all straight moves up to the board length.
+    rook_effects = np.concatenate(
+        [
+            np.outer(np.arange(1, game_size), direction)
+            for direction in Logic.four_adjacency
+        ]
+    ).astype(np.int8)
+
+    actions: List[Action] = []
+    actors_to_actions: Dict[Tuple[Token, int], List[Action]] = dict()
+    actors_to_indices: Dict[Tuple[Token, int], range] = dict()
+    effects = []
+    for token, freq in token_count:
+        if token in [Token.flag, Token.bomb]:
+            continue
+
+        for version in range(1, freq + 1):
+            actor = (token, version)
+            start = len(actions)
+            actors_to_actions[actor] = [
+                Action(actor, Position(int(x), int(y))) for x, y in rook_effects
+            ]
+            actions.extend(actors_to_actions[actor])
+            actors_to_indices[actor] = range(start, len(actions))
+            effects.append(rook_effects)
+
+    action_to_index = {action: idx for idx, action in enumerate(actions)}
+    actions_inverse: Dict[Action, Action] = {
+        action: actions[action_to_index[-action]] for action in actions
+    }
+
+    return (
+        tuple(actions),
+        actions_inverse,
+        actors_to_actions,
+        actors_to_indices,
+        np.concatenate(effects),
+    )
+
+
 class ActionMap:
     def __init__(self, game_specs: GameSpecification):
         self.specs = game_specs
         (
-            self.actions,  # type: List[Action]
+            self.actions,  # type: Tuple[Action, ...]
             self.actions_inverse,  # type: Dict[Action, Action]
             self.actors_to_actions,  # type: Dict[Tuple[Token, int], List[Action]]
-        ) = self._build_action_map(self.specs.token_count)
+            self.actors_to_indices,  # type: Dict[Tuple[Token, int], range]
+            self.effects,  # type: np.ndarray
+        ) = build_action_map(
+            self.specs.game_size, tuple(self.specs.token_count.items())
+        )
         self.action_dim = len(self.actions)
 
     def __len__(self):
@@ -92,42 +155,6 @@ class ActionMap:
     def invert_action(self, action: Action):
         return self.actions_inverse[action]
 
-    def _build_action_map(
-        self, available_types: Dict[Token, int], logic: Logic = Logic()
-    ):
-        actions: List[Action] = []
-        actions_inverse: Dict[Action, int] = dict()
-        actors_to_actions: Dict[Tuple[Token, int], List[Action]] = dict()
-
-        for token, freq in available_types.items():
-            if token in [Token.flag, Token.bomb]:
-                continue
-
-            moves: Iterator[Move] = logic.moves_iter(
-                token,
-                Position(0, 0),
-                self.specs.game_size,
-                distances=[self.specs.game_size] * 4,
-            )
-
-            for version in range(1, freq + 1):
-                actor = (token, version)
-                actors_to_actions[actor] = []
-                for (pos_before, pos_after) in moves:
-                    action = Action(
-                        (token, version), pos_after - pos_before
-                    )
-                    actions.append(action)
-                    actors_to_actions[actor].append(action)
-
-            for idx, action in enumerate(actions):
-                neg_action = -action
-                for other_idx, other_action in enumerate(actions[idx + 1 :]):
-                    if other_action == neg_action:
-                        actions_inverse[action] = other_idx
-
-        return actions, actions_inverse, actors_to_actions
-
     def actions_mask(
         self, board: Board, team: Union[Team, int], logic: Logic = Logic()
     ):
@@ -150,17 +177,20 @@ class ActionMap:
 
         """
         actions_mask = np.zeros(self.action_dim, dtype=np.int16)
-        for (x, y), piece in np.ndenumerate(board):
-            if (
-                piece is not None and piece.team == Team(team) and piece.can_move
-            ):  # board position has a piece on it
-                pos = Position(x, y)
-                # get the index range of this piece in the moves list
-                actions_indices = self[piece]
-                for action_idx in actions_indices:
-                    action = self[action_idx]
-                    if logic.is_legal_move(board, Move(pos, action(pos))):
-                        actions_mask[action_idx] = 1
+        tokens, versions = board.tokens, board.versions
+        # only board positions with a movable piece of the team on it
+        for x, y in np.argwhere(board.movable(Team(team))):
+            pos = Position(int(x), int(y))
+            # get the index range of this piece in the moves list
+            actions_indices = self.actors_to_indices[
+                Token(int(tokens[x, y])), int(versions[x, y])
+            ]
+            for action_idx, (dx, dy) in zip(
+                actions_indices, self.effects[actions_indices.start : actions_indices.stop]
+            ):
+                move = Move(pos, Position(int(x + dx), int(y + dy)))
+                if logic.is_legal_move(board, move):
+                    actions_mask[action_idx] = 1
         return actions_mask
 
     def action_to_move(self, action: Union[int, Action], state: State, team: Team):
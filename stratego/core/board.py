@@ -2,10 +2,10 @@ from __future__ import annotations
 
 import operator
 from copy import deepcopy
-from typing import Optional, Tuple, Sequence
+from typing import Optional, Tuple, Sequence, Union
 
-from .game_defs import Token
-from .piece import ShadowPiece, Piece, Team, Obstacle
+from .game_defs import Token, NR_TOKENS
+from .piece import PieceBase, ShadowPiece, Piece, Team, Obstacle
 from .position import Position
 
 import numpy as np
@@ -14,7 +14,74 @@ from functools import singledispatchmethod, reduce
 import matplotlib.pyplot as plt
 
 
+# plane value of a field without a piece (for the tokens and the teams plane)
+EMPTY = -1
+# plane value of a token, which is unknown to the board's perspective (i.e. a ShadowPiece)
+UNKNOWN = -2
+# bit flags of the flags plane
+HIDDEN = 1
+MOVED = 2
+
+# the FEN symbol of each token, indexed by the token value (uppercase for blue, lowercase for red)
+FEN_SYMBOLS = "FYSNELCJOGMB"
+FEN_UNKNOWN = "U"
+FEN_OBSTACLE = "x"
+
+# Zobrist keys of a piece per (token, team, field index, hidden, has moved), with the last
+# token index reserved for UNKNOWN tokens. The board key is the XOR of the keys of all its pieces.
+# The seed is fixed, so that keys agree across processes.
+_zobrist_rng = np.random.default_rng(0)
+ZOBRIST = _zobrist_rng.integers(
+    0, 2 ** 63, size=(NR_TOKENS + 1, 2, 10 * 10, 2, 2), dtype=np.uint64
+)
+# the keys of the active team
+ZOBRIST_TEAM = _zobrist_rng.integers(0, 2 ** 63, size=2, dtype=np.uint64)
+
+
+def _zobrist_key(
+    token: int, team: int, pos: Tuple[int, int], flags: int, n_cols: int
+) -> np.uint64:
+    if token == EMPTY or token == Token.obstacle.value:
+        # obstacles never change, hence they don't need to be part of the key
+        return np.uint64(0)
+    return ZOBRIST[
+        token if token != UNKNOWN else NR_TOKENS,
+        team,
+        pos[0] * n_cols + pos[1],
+        flags & HIDDEN,
+        (flags & MOVED) >> 1,
+    ]
+
+
+def _cell_planes(piece: Optional[PieceBase]) -> Tuple[int, int, int, int]:
+    """
+    Translate the content of a field into its (token, team, version, flags) plane values.
+    """
+    if piece is None:
+        return EMPTY, EMPTY, 0, 0
+    if isinstance(piece, Obstacle):
+        return Token.obstacle.value, EMPTY, 0, 0
+    flags = HIDDEN * piece.hidden | MOVED * piece.has_moved
+    if isinstance(piece, Piece):
+        return piece.token.value, piece.team.value, piece.version, flags
+    return UNKNOWN, piece.team.value, 0, flags
+
+
 class Board(np.ndarray):
+    """
+    The board holds the pieces in an object array. For fast access in the game logic, each field is
+    additionally mirrored into small integer planes (struct-of-arrays):
+
+        tokens:   the token value of the piece on the field, EMPTY if no piece, UNKNOWN for a ShadowPiece.
+        teams:    the team value of the piece on the field, EMPTY if no piece or an obstacle.
+        versions: the version of the piece on the field, 0 if not a regular piece.
+        flags:    the HIDDEN and MOVED bits of the piece on the field.
+
+    Alongside the planes, the board keeps its Zobrist key up to date.
+
+    The planes are maintained on every field assignment through the board. Views and copies of a board
+    (e.g. np.flip, deepcopy) rebuild them lazily from the pieces on first access.
+    """
 
     def __new__(cls, arr_or_shape: np.ndarray, **kwargs):
         if isinstance(arr_or_shape, Sequence):
@@ -26,6 +93,186 @@ class Board(np.ndarray):
         )
         return obj
 
+    def __array_finalize__(self, obj):
+        # the content relation to `obj` is unknown here (view, copy, ufunc output, ...),
+        # hence the planes are rebuilt from the contained pieces only when needed.
+        self._tokens: Optional[np.ndarray] = None
+        self._teams: Optional[np.ndarray] = None
+        self._versions: Optional[np.ndarray] = None
+        self._flags: Optional[np.ndarray] = None
+        # the Zobrist key, stored as array to allow in-place updates from the kernels
+        self._zobrist: Optional[np.ndarray] = None
+        # the cached result of 'scan', reset by every field assignment
+        self._scan: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def tokens(self) -> np.ndarray:
+        if self._tokens is None:
+            self.build_planes()
+        return self._tokens
+
+    @property
+    def teams(self) -> np.ndarray:
+        if self._tokens is None:
+            self.build_planes()
+        return self._teams
+
+    @property
+    def versions(self) -> np.ndarray:
+        if self._tokens is None:
+            self.build_planes()
+        return self._versions
+
+    @property
+    def flags(self) -> np.ndarray:
+        if self._tokens is None:
+            self.build_planes()
+        return self._flags
+
+    @property
+    def zobrist(self) -> np.uint64:
+        if self._tokens is None:
+            self.build_planes()
+        return self._zobrist[0]
+
+    @property
+    def zobrist_key(self) -> np.ndarray:
+        """
+        The Zobrist key as single element array, to be updated in place.
+        """
+        if self._tokens is None:
+            self.build_planes()
+        return self._zobrist
+
+    def scan(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The piece counts per (team, token) and whether each team has a legal move left.
+        The result is computed in a single pass over the planes and cached until the next field
+        assignment.
+        """
+        if self._scan is None:
+            # deferred import, the kernels depend on the plane constants of this module
+            from . import _kernels
+
+            self._scan = _kernels.scan_board_nb(self.tokens, self._teams)
+        return self._scan
+
+    def build_planes(self):
+        """
+        (Re-)build the integer planes from the pieces on the board.
+        This needs to be called manually only if pieces have been changed in place (e.g. their team).
+        """
+        self._tokens = np.full(self.shape, EMPTY, dtype=np.int8)
+        self._teams = np.full(self.shape, EMPTY, dtype=np.int8)
+        self._versions = np.zeros(self.shape, dtype=np.int8)
+        self._flags = np.zeros(self.shape, dtype=np.int8)
+        self._zobrist = np.zeros(1, dtype=np.uint64)
+        self._scan = None
+        for pos, piece in np.ndenumerate(self):
+            if piece is not None:
+                self._write_planes(pos, piece)
+
+    def clear(self):
+        """
+        Remove all pieces (and obstacles) from the board. The planes are reset in place,
+        so that the board can be reused without any reallocation.
+        """
+        self.fill(None)
+        self._scan = None
+        if self._tokens is not None:
+            self._tokens.fill(EMPTY)
+            self._teams.fill(EMPTY)
+            self._versions.fill(0)
+            self._flags.fill(0)
+            self._zobrist.fill(0)
+
+    def _write_planes(self, pos: Tuple[int, int], piece: Optional[PieceBase]):
+        n_cols = self.shape[1]
+        token, team, version, flags = _cell_planes(piece)
+        self._zobrist[0] ^= _zobrist_key(
+            self._tokens[pos], self._teams[pos], pos, self._flags[pos], n_cols
+        ) ^ _zobrist_key(token, team, pos, flags, n_cols)
+        self._tokens[pos] = token
+        self._teams[pos] = team
+        self._versions[pos] = version
+        self._flags[pos] = flags
+
+    def set_field(
+        self,
+        pos: Tuple[int, int],
+        piece: Optional[PieceBase],
+        sync_planes: bool = True,
+    ):
+        """
+        Place the piece on the given field.
+
+        Parameters
+        ----------
+        pos: Tuple[int, int],
+            the field's coordinates.
+        piece: PieceBase or None,
+            the piece to place on the field.
+        sync_planes: bool,
+            whether to write the piece into the planes as well. Pass False only if the planes
+            have already been updated (e.g. by a compiled kernel).
+        """
+        super().__setitem__(pos, piece)
+        self._scan = None
+        if sync_planes and self._tokens is not None:
+            self._write_planes(pos, piece)
+
+    def planes_at(self, pos: Tuple[int, int]) -> Tuple[int, int, int, int]:
+        """
+        The (token, team, version, flags) plane values of the given field.
+        """
+        return (
+            int(self.tokens[pos]),
+            int(self._teams[pos]),
+            int(self._versions[pos]),
+            int(self._flags[pos]),
+        )
+
+    def movable(self, team: Union[Team, int]) -> np.ndarray:
+        """
+        Boolean mask of all fields holding a piece of the given team, which is able to move.
+        """
+        tokens = self.tokens
+        return (
+            (self._teams == int(team))
+            & (tokens != Token.flag.value)
+            & (tokens != Token.bomb.value)
+        )
+
+    def fen(self) -> str:
+        """
+        A compact string of the board content in the style of chess' FEN notation.
+
+        The rows are separated by '/' and runs of empty fields are given by their length.
+        Pieces are given by their token symbol (see FEN_SYMBOLS), uppercase for team blue and
+        lowercase for team red. Unknown pieces are 'U'/'u' and obstacles 'x'.
+        """
+        tokens, teams = self.tokens, self._teams
+        rows = []
+        for token_row, team_row in zip(tokens.tolist(), teams.tolist()):
+            row = []
+            n_empty = 0
+            for token, team in zip(token_row, team_row):
+                if token == EMPTY:
+                    n_empty += 1
+                    continue
+                if n_empty:
+                    row.append(str(n_empty))
+                    n_empty = 0
+                if token == Token.obstacle.value:
+                    row.append(FEN_OBSTACLE)
+                    continue
+                symbol = FEN_UNKNOWN if token == UNKNOWN else FEN_SYMBOLS[token]
+                row.append(symbol if team == Team.blue.value else symbol.lower())
+            if n_empty:
+                row.append(str(n_empty))
+            rows.append("".join(row))
+        return "/".join(rows)
+
     def print_board(
         self,
         figure: Optional[plt.Figure] = None,
@@ -166,13 +413,23 @@ class Board(np.ndarray):
 
     @singledispatchmethod
     def __setitem__(self, key, value):
+        if (
+            isinstance(key, tuple)
+            and len(key) == 2
+            and all(isinstance(k, (int, np.integer)) for k in key)
+        ):
+            # a single field assignment
+            return self.set_field(key, value)
         # whenever np.ndarray knows how to handle the type, we let it
-        return super().__setitem__(key, value)
+        super().__setitem__(key, value)
+        # arbitrary assignments (slices, masks, ...) invalidate the planes
+        self._tokens = None
+        self._scan = None
 
     @__setitem__.register(Position)
     def _(self, key: Position, value):
         # for our custom position type
-        return super().__setitem__((key.x, key.y), value)
+        return self.set_field(key.coords, value)
 
 
 class InfoBoard(Board):
@@ -197,9 +454,8 @@ class InfoBoard(Board):
         team: Team,
             the player whose information is to be mapped
         """
-        super().__init__(board, team)
         self.perspective = team
         opponent = team.opponent()
         for piece in self.flatten():
-            if piece is not None and piece.team == opponent and piece.hidden:
+            if isinstance(piece, Piece) and piece.team == opponent and piece.hidden:
                 self[piece.position] = ShadowPiece(piece)
@@ -4,9 +4,11 @@ from .position import Position
 
 from abc import ABC
 from enum import Enum
-from functools import singledispatchmethod
+from functools import singledispatchmethod, lru_cache
 from typing import Union, Tuple, Dict, Sequence
 
+import numpy as np
+
 
 class Team(Enum):
     blue = 0
@@ -45,6 +47,14 @@ class Token(Enum):
     def __int__(self):
         return self.value
 
+    def __index__(self):
+        # allows indexing arrays by tokens
+        return self.value
+
+
+# the number of tokens that pieces can have (obstacles excluded)
+NR_TOKENS = max(token.value for token in Token if token != Token.obstacle) + 1
+
 
 class HookPoint(Enum):
     pre_run = 0
@@ -100,9 +110,20 @@ def _create_battle_matrix():
     return bm
 
 
+def _battle_matrix_to_array(bm: Dict[Tuple[Token, Token], int]):
+    # obstacles can never fight, so the array only spans the actual game tokens
+    arr = np.zeros((NR_TOKENS, NR_TOKENS), dtype=np.int8)
+    for (attacker, defender), outcome in bm.items():
+        if Token.obstacle not in (attacker, defender):
+            arr[attacker.value, defender.value] = outcome
+    return arr
+
+
 class BattleMatrix(ABC):
 
     matrix = _create_battle_matrix()
+    # the same outcomes, indexed by the tokens' integer values (as found in the board planes).
+    array = _battle_matrix_to_array(matrix)
 
     def __class_getitem__(cls, tokens: Sequence[Token]):
         return cls.matrix[tokens[0], tokens[1]]
@@ -165,14 +186,72 @@ def build_specs(game_size: int):
         game_size = 10
     else:
         raise ValueError(f"Board size {game_size} not supported.")
-    return token_count, obstacle_positions, setup_rows, game_size
+    # the token count indexed by the tokens' integer values
+    token_count_array = np.zeros(NR_TOKENS, dtype=np.int64)
+    for token, count in token_count.items():
+        token_count_array[token] = count
+    # the fields of each team's setup, and the (token, version) of all pieces of a team
+    setup_positions = {
+        team: tuple(Position(r, c) for r in rows for c in range(game_size))
+        for team, rows in setup_rows.items()
+    }
+    # every token repeated by its frequency, each with its running version 1, ..., freq
+    freqs = np.fromiter(token_count.values(), dtype=np.int64)
+    setup_tokens = np.repeat(np.fromiter(map(int, token_count), dtype=np.int64), freqs)
+    setup_versions = np.arange(1, freqs.sum() + 1) - np.repeat(
+        np.cumsum(freqs) - freqs, freqs
+    )
+    setup_pieces = tuple(
+        (Token(token), version)
+        for token, version in zip(setup_tokens.tolist(), setup_versions.tolist())
+    )
+    return (
+        token_count,
+        obstacle_positions,
+        setup_rows,
+        game_size,
+        token_count_array,
+        setup_positions,
+        setup_pieces,
+    )
+
+
+@lru_cache(maxsize=None)
+def ray_table(game_size: int) -> np.ndarray:
+    """
+    The lookup table of straight move targets on a square board of the given length.
+
+    Entry [square, direction, k] is the flat index (row * game_size + col) of the field k + 1 steps
+    away from the square in the given direction (ordered as Logic.four_adjacency), or -1 if it
+    lies off the board. Single-step pieces only need the slice [:, :, :1].
+    """
+    n_squares = game_size * game_size
+    table = np.full((n_squares, 4, game_size - 1), -1, dtype=np.int64)
+    for square in range(n_squares):
+        row, col = divmod(square, game_size)
+        for d, (dr, dc) in enumerate(((1, 0), (-1, 0), (0, 1), (0, -1))):
+            for k in range(game_size - 1):
+                r, c = row + dr * (k + 1), col + dc * (k + 1)
+                if not (0 <= r < game_size and 0 <= c < game_size):
+                    break
+                table[square, d, k] = r * game_size + c
+    return table
 
 
 _game_specs = {size: build_specs(size) for size in (5, 7, 10)}
 
 
 class GameSpecification:
-    def __init__(self, game_size: Union[str, int]):
+    """
+    The specification of a game by its board size.
+
+    There is a single (immutable) instance per board size, so that constructing a specification
+    is just a lookup.
+    """
+
+    _instances: Dict[int, GameSpecification] = dict()
+
+    def __new__(cls, game_size: Union[str, int]):
         if isinstance(game_size, str):
             game_size = game_size.lower()
             if game_size in ["s", "small"]:
@@ -190,7 +269,15 @@ class GameSpecification:
             assert game_size in [5, 7, 10,], (
                 "'game_size' parameter as integer must be one of\n" "\t[5, 7, 10]."
             )
-        self._game_specs = _game_specs[game_size]
+        if (specs := cls._instances.get(game_size)) is None:
+            specs = super().__new__(cls)
+            specs._game_specs = _game_specs[game_size]
+            cls._instances[game_size] = specs
+        return specs
+
+    def __reduce__(self):
+        # unpickle into the shared instance of the board size
+        return GameSpecification, (self.game_size,)
 
     @property
     def token_count(self) -> Dict[Token, int]:
@@ -207,3 +294,19 @@ class GameSpecification:
     @property
     def game_size(self) -> int:
         return self._game_specs[3]
+
+    @property
+    def token_count_array(self) -> np.ndarray:
+        return self._game_specs[4]
+
+    @property
+    def setup_positions(self) -> Dict[Team, Tuple[Position, ...]]:
+        return self._game_specs[5]
+
+    @property
+    def setup_pieces(self) -> Tuple[Tuple[Token, int], ...]:
+        return self._game_specs[6]
+
+    @property
+    def ray_table(self) -> np.ndarray:
+        return ray_table(self.game_size)
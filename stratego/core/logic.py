@@ -1,4 +1,3 @@
-from .piece import Obstacle
 from .game_defs import (
     Status,
     MAX_NR_TURNS,
@@ -6,16 +5,16 @@ from .game_defs import (
     Team,
     BattleMatrix,
     GameSpecification,
+    ray_table,
 )
 from .state import State
 from .position import Position, Move
-from .board import Board
+from .board import Board, EMPTY, ZOBRIST
+from . import _kernels
 from stratego.utils import Singleton
 
 from typing import Sequence, Optional, Iterator, Union, Dict
-from scipy import spatial
 import numpy as np
-from collections import Counter, defaultdict
 
 
 class Logic(metaclass=Singleton):
@@ -39,43 +38,47 @@ class Logic(metaclass=Singleton):
         """
         from_pos = move[0]
         to_pos = move[1]
-        fight_outcome = None
 
         board = state.board
+        piece_att, piece_def = board[from_pos], board[to_pos]
+        tokens, teams = board.tokens, board.teams
 
-        board[from_pos].has_moved = True
-
-        if not board[to_pos] is None:  # Target field is not empty, then has to fight
-            board[from_pos].hidden = board[to_pos].hidden = False
-            piece_def = board[to_pos]
-            piece_att = board[from_pos]
-
-            if piece_att.team == piece_def.team:
-                print("Warning, can't let pieces of same team fight!")
-                return False
+        if piece_def is not None and teams[from_pos.coords] == teams[to_pos.coords]:
+            print("Warning, can't let pieces of same team fight!")
+            return False
 
-            fight_outcome = BattleMatrix[piece_att.token, piece_def.token]
-            board_update = dict()
+        fight_outcome = _kernels.do_move_nb(
+            tokens,
+            teams,
+            board.versions,
+            board.flags,
+            BattleMatrix.array,
+            ZOBRIST,
+            board.zobrist_key,
+            *from_pos.coords,
+            *to_pos.coords,
+            state.dead_pieces[Team.blue],
+            state.dead_pieces[Team.red],
+        )
+
+        # mirror the planes' update onto the pieces
+        piece_att.has_moved = True
+        if fight_outcome == _kernels.NO_FIGHT:
+            fight_outcome = None
+            board_update = {from_pos: None, to_pos: piece_att}
+        else:
+            piece_att.hidden = piece_def.hidden = False
             if fight_outcome == 1:
                 # attacker won and moves onto defender spot, defender dies
-                state.dead_pieces[piece_def.team][piece_def.token] += 1
-                board_update.update({from_pos: board[from_pos], to_pos: None})
-
+                board_update = {from_pos: None, to_pos: piece_att}
             elif fight_outcome == 0:
                 # mutual annihilation, both disappear
-                state.dead_pieces[piece_def.team][piece_def.token] += 1
-                state.dead_pieces[piece_att.team][piece_att.token] += 1
-                board_update.update({from_pos: None, to_pos: None})
-
+                board_update = {from_pos: None, to_pos: None}
             else:
                 # attacker lost and dies, defender stays
-                state.dead_pieces[piece_att.team][piece_att.token] += 1
-                board_update.update({from_pos: None, to_pos: board[to_pos]})
-
-        else:
-            board_update = {from_pos: None, to_pos: board[from_pos]}
+                board_update = {from_pos: None, to_pos: piece_def}
 
-        state.update_board(board_update)
+        state.update_board(board_update, sync_planes=False)
 
         state.turn_counter += 1
 
@@ -92,7 +95,7 @@ class Logic(metaclass=Singleton):
             number of moves to undo
         """
         for t in range(n):
-            _, move, (piece_from, piece_to) = state.history.pop_last()
+            _, _, move, (piece_from, piece_to) = state.history.pop_last()
 
             state.board[move.from_] = piece_from
             state.board[move.to_] = piece_to
@@ -100,7 +103,7 @@ class Logic(metaclass=Singleton):
             if piece_to is not None:
                 # if the target position held an actual piece, then there was a fight and
                 # we need to update the dead pieces dictionary.
-                if fight := BattleMatrix[piece_from.token, piece_to.token] == 0:
+                if (fight := BattleMatrix[piece_from.token, piece_to.token]) == 0:
                     state.dead_pieces[Team(piece_from.team)][piece_from.token] -= 1
                     state.dead_pieces[Team(piece_to.team)][piece_to.token] -= 1
                 elif fight == 1:
@@ -110,6 +113,8 @@ class Logic(metaclass=Singleton):
                     # the attacker lost back then, so now remove it from the dead pieces
                     state.dead_pieces[Team(piece_from.team)][piece_from.token] -= 1
 
+            state.turn_counter -= 1
+
         state.unset_status()
 
     @classmethod
@@ -120,26 +125,17 @@ class Logic(metaclass=Singleton):
 
     @classmethod
     def check_terminal(cls, state: State, specs: GameSpecification):
-        for player in (Team(0), Team(1)):
-            dead_pieces = state.dead_pieces[player]
-            if dead_pieces[Token.flag] == 1 or all(
-                dead_pieces[token] == count
-                for token, count in specs.token_count.items()
-                if token not in [Token.flag, Token.bomb]
-                # all move-able enemy pieces have been captured -> opponent won
-            ):
-                state.set_status(Status.win(player.opponent()))
-                return
-
-        if state.turn_counter >= MAX_NR_TURNS or any(
-            all(move is None for move in cls.possible_moves_iter(state.board, team))
-            for team in (Team.blue, Team.red)
-        ):
-            state.set_status(Status.tie)
-            return
-
-        # if no win or draw condition fits, then the match is ongoing
-        state.set_status(Status.ongoing)
+        _, has_moves = state.board.scan()
+        status = _kernels.check_terminal_nb(
+            has_moves,
+            state.dead_pieces[Team.blue],
+            state.dead_pieces[Team.red],
+            specs.token_count_array,
+            state.turn_counter,
+            MAX_NR_TURNS,
+        )
+        state.set_status(Status(status))
+        return state.status
 
     @classmethod
     def is_legal_move(cls, board: Board, move_to_check: Move):
@@ -157,37 +153,34 @@ class Logic(metaclass=Singleton):
         """
         if move_to_check is None:
             return False
-        pos_before = move_to_check[0]
-        pos_after = move_to_check[1]
+        x_before, y_before = move_to_check[0].coords
+        x_after, y_after = move_to_check[1].coords
 
-        for x in (pos_before[0], pos_before[1], pos_after[0], pos_after[1]):
+        for x in (x_before, y_before, x_after, y_after):
             if not -1 < x < board.shape[0]:
                 return False
 
-        # piece to move is not at this position
-        if board[pos_before] is None:
+        tokens, teams = board.tokens, board.teams
+        team = teams[x_before, y_before]
+
+        # no piece to move at this position
+        if team == EMPTY:
             return False
 
-        if not board[pos_after] is None:
-            if isinstance(board[pos_after], Obstacle):
-                return False  # cant fight obstacles
-            elif board[pos_after].team == board[pos_before].team:
-                return False  # cant fight own pieces
-
-        move_dist = spatial.distance.cityblock(pos_before, pos_after)
-        if move_dist > 1:
-            if pos_after[0] == pos_before[0]:
-                dist_sign = int(np.sign(pos_after[1] - pos_before[1]))
-                for k in list(
-                    range(pos_before[1] + dist_sign, pos_after[1], int(dist_sign))
-                ):
-                    if board[(pos_before[0], k)] is not None:
-                        return False  # pieces in the way of the move
-            else:
-                dist_sign = int(np.sign(pos_after[0] - pos_before[0]))
-                for k in range(pos_before[0] + dist_sign, pos_after[0], int(dist_sign)):
-                    if board[(k, pos_before[1])] is not None:
-                        return False  # pieces in the way of the move
+        if tokens[x_after, y_after] == Token.obstacle.value:
+            return False  # cant fight obstacles
+        if teams[x_after, y_after] == team:
+            return False  # cant fight own pieces
+
+        # the fields in between need to be empty
+        if x_after == x_before:
+            lo, hi = sorted((y_before, y_after))
+            in_between = tokens[x_before, lo + 1 : hi]
+        else:
+            lo, hi = sorted((x_before, x_after))
+            in_between = tokens[lo + 1 : hi, y_before]
+        if (in_between != EMPTY).any():
+            return False  # pieces in the way of the move
 
         return True
 
@@ -201,40 +194,26 @@ class Logic(metaclass=Singleton):
         Iterator,
             lazily iterates over all possible moves of the player.
         """
-        team = Team(team)
         game_size = board.shape[0]
-        for pos, piece in np.ndenumerate(board):
-            if (
-                piece is not None
-                and not isinstance(piece, Obstacle)
-                and piece.team == team
-                and piece.can_move
-            ):
-                # board position has a movable piece of your team on it
-                for move in cls.moves_iter(
-                    piece.token, Position(tuple(map(int, pos))), game_size
-                ):
-                    if cls.is_legal_move(board, move):
-                        yield move
+        moves = _kernels.legal_moves_nb(
+            board.tokens, board.teams, int(team), ray_table(game_size)
+        )
+        for from_sq, to_sq in moves.tolist():
+            yield Move(
+                Position(*divmod(from_sq, game_size)),
+                Position(*divmod(to_sq, game_size)),
+            )
 
     @classmethod
-    def compute_dead_pieces(cls, board: Board, token_count: Dict[Token, int]):
-        pieces0, pieces1 = defaultdict(int), defaultdict(int)
-
-        for piece in board.flatten():
-            if piece is not None:
-                if piece.team:
-                    pieces1[piece.token] += 1
-                else:
-                    pieces0[piece.token] += 1
-
-        dead_pieces = dict()
-        for pcs, team in zip((pieces0, pieces0), (0, 1)):
-            dead_pieces_dict = dict()
-            for token, freq in Counter(token_count).items():
-                dead_pieces_dict[token] = freq - pcs[token]
-            dead_pieces[team] = dead_pieces_dict
-        return dead_pieces
+    def compute_dead_pieces(
+        cls, board: Board, token_count: np.ndarray
+    ) -> Dict[Team, np.ndarray]:
+        """
+        Compute the dead pieces of each team as the difference of the specified token count
+        (see GameSpecification.token_count_array) and the pieces on the board.
+        """
+        counts, _ = board.scan()
+        return {team: token_count - counts[team.value] for team in Team}
 
     @classmethod
     def moves_iter(
@@ -244,7 +223,7 @@ class Logic(metaclass=Singleton):
         game_size: int,
         distances: Optional[Sequence[int]] = None,
     ) -> Iterator[Move]:
-        token = Token(token)
+        token = Token(int(token))
 
         if distances is None:
             distances = (game_size - pos.x, pos.x + 1, game_size - pos.y, pos.y + 1)
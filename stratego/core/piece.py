@@ -18,6 +18,7 @@ class PieceBase(ABC):
         self.position = Position(position)
         self.hidden = hidden
         self.can_move = can_move
+        self.has_moved = False
 
     def change_position(self, new_pos):
         self.position = new_pos
@@ -51,6 +52,13 @@ class Piece(PieceBase):
     def __hash__(self):
         return hash((self.team, self.token, self.version))
 
+    def clone(self) -> Piece:
+        """
+        A fresh copy of the piece, as it stands before the game (i.e. it has not moved yet).
+        This is much cheaper than a deepcopy.
+        """
+        return Piece(self.position, self.team, self.token, self.version, self.hidden)
+
     def __repr__(self):
         return (
             f"{'B' if self.team == Team.blue else 'R'}"
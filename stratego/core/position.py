@@ -40,6 +40,13 @@ class Position:
     def __hash__(self):
         return hash(self.coords)
 
+    def __eq__(self, other):
+        if isinstance(other, Position):
+            return self.coords == other.coords
+        if isinstance(other, (tuple, list)):
+            return self.coords == tuple(other)
+        return NotImplemented
+
     def __add__(self, other):
         return Position(self.x + other.x, self.y + other.y)
 
@@ -1,28 +1,36 @@
-import copy
-from collections import defaultdict
+from copy import deepcopy
 from typing import Sequence, Optional, Tuple, Dict, List
 
-from .game_defs import Status, Token, Team
-from .piece import Piece, ShadowPiece, Obstacle
+from .game_defs import Status, Token, Team, NR_TOKENS
+from .piece import PieceBase, Piece, ShadowPiece, Obstacle
 from .position import Position, Move
-from .board import Board, InfoBoard
+from .board import Board, InfoBoard, HIDDEN, MOVED, ZOBRIST_TEAM
+from .transposition import TranspositionTable
 
 import numpy as np
 
 
 class History:
+    """
+    The record of the moves played.
+
+    Instead of copying the pieces of each move, the history keeps the live pieces together with
+    the plane values of their fields at the time of the move. Snapshots of the pieces are
+    reconstructed from these values only when requested.
+    """
+
     def __init__(self):
         self.turns: List[int] = []
         self.move: Dict[int, Move] = dict()
         self.team: Dict[int, Team] = dict()
-        self.pieces: Dict[int, Tuple[Piece, Piece]] = dict()
+        self.pieces: Dict[int, Tuple[Optional[PieceBase], Optional[PieceBase]]] = dict()
+        self.planes: Dict[int, Tuple[Tuple[int, int, int, int], ...]] = dict()
 
     def get_by_turn(self, turn: int):
-        return self.team[turn], self.move[turn], self.pieces[turn]
+        return self.team[turn], self.move[turn], self._snapshot(turn)
 
     def get_by_index(self, idx: int):
-        turn = self.turns[idx]
-        return self.team[turn], self.move[turn], self.pieces[turn]
+        return self.get_by_turn(self.turns[idx])
 
     def commit_move(self, board: Board, move: Move, turn: int):
         """
@@ -31,20 +39,46 @@ class History:
         from_ = move.from_
         to_ = move.to_
         self.move[turn] = move
-        self.pieces[turn] = copy.deepcopy(board[from_]), copy.deepcopy(board[to_])
+        self.pieces[turn] = board[from_], board[to_]
+        self.planes[turn] = board.planes_at(from_.coords), board.planes_at(to_.coords)
         self.team[turn] = Team(turn % 2)
         self.turns.append(turn)
 
     def pop_last(self):
         """
         Remove the latest entries from the history. Return the contents, that were removed.
+        The returned pieces are the live pieces, restored to their state at the time of the move.
+
         Returns
         -------
         tuple,
             all removed entries in sequence: turn, team, move, pieces
         """
-        turn = self.turns[-1]
-        return turn, self.team.pop(turn), self.move.pop(turn), self.pieces.pop(turn)
+        turn = self.turns.pop()
+        move = self.move.pop(turn)
+        pieces = self.pieces.pop(turn)
+        for piece, pos, (_, _, _, flags) in zip(
+            pieces, move.from_to, self.planes.pop(turn)
+        ):
+            if piece is not None:
+                piece.change_position(pos)
+                piece.hidden = bool(flags & HIDDEN)
+                piece.has_moved = bool(flags & MOVED)
+        return turn, self.team.pop(turn), move, pieces
+
+    def _snapshot(self, turn: int):
+        snapshot = []
+        for piece, pos, (token, team, version, flags) in zip(
+            self.pieces[turn], self.move[turn].from_to, self.planes[turn]
+        ):
+            if isinstance(piece, Piece):
+                # the tokens need to be enum members for Piece to tell immovable pieces apart
+                piece = Piece(
+                    pos, Team(team), Token(token), version, hidden=bool(flags & HIDDEN)
+                )
+                piece.has_moved = bool(flags & MOVED)
+            snapshot.append(piece)
+        return tuple(snapshot)
 
 
 class State:
@@ -57,7 +91,8 @@ class State:
         turn_count: int = 0,
         flipped_teams: bool = False,
         status: Status = Status.ongoing,
-        dead_pieces: Dict[Team, Dict[Token, int]] = None,
+        dead_pieces: Dict[Team, np.ndarray] = None,
+        tt: Optional[TranspositionTable] = None,
     ):
         self.board = board
         self.piece_by_id: Dict[Tuple[Token, int, Team], Piece] = (
@@ -66,6 +101,8 @@ class State:
             else self._relate_piece_to_identifier(self.board)
         )
         self.history: History = history if history is not None else History()
+        # the optional cache of search results, keyed by the hash of the state
+        self.tt: Optional[TranspositionTable] = tt
         self.game_size: int = board.shape[0]
 
         self._status: Status = status
@@ -79,12 +116,25 @@ class State:
 
         if dead_pieces is not None:
             assert all(
-                isinstance(dead_pieces[team], defaultdict)
+                isinstance(dead_pieces[team], np.ndarray)
                 for team in [Team.blue, Team.red]
-            ), "dead_pieces parameter needs to contain a 'defaultdict(int)' for each team."
+            ), "dead_pieces parameter needs to contain a token-indexed array for each team."
             self.dead_pieces = dead_pieces
         else:
-            self.dead_pieces = {Team(0): defaultdict(int), Team(1): defaultdict(int)}
+            # the number of dead pieces per token, indexed by the token's value
+            self.dead_pieces = {
+                Team(0): np.zeros(NR_TOKENS, dtype=np.int64),
+                Team(1): np.zeros(NR_TOKENS, dtype=np.int64),
+            }
+
+    def __deepcopy__(self, memo):
+        # copies of a state (e.g. the nodes of a tree search) share the transposition table
+        if self.tt is not None:
+            memo[id(self.tt)] = self.tt
+        copied = object.__new__(type(self))
+        memo[id(self)] = copied
+        copied.__dict__.update(deepcopy(self.__dict__, memo))
+        return copied
 
     def __str__(self):
         return (
@@ -94,11 +144,12 @@ class State:
             f"Turns: {str(self.turn_counter)}\n"
             f"Dead Pieces Blue: {self.dead_pieces[Team.blue]}\n"
             f"Dead Pieces Red: {self.dead_pieces[Team.red]}\n"
-            f"{np.array_repr(self.board)}\n"
+            f"Board: {self.board.fen()}\n"
         )
 
     def __hash__(self):
-        return hash(str(self))
+        # the board's Zobrist key, with the active team keyed in
+        return int(self.board.zobrist ^ ZOBRIST_TEAM[self._active_team.value])
 
     @property
     def active_team(self):
@@ -139,20 +190,30 @@ class State:
         self._turn_counter = count
         self._active_team = Team((count + int(self._starting_team)) % 2)
 
-    def update_board(self, pos_to_piece_map: Dict[Position, Piece]):
+    def update_board(
+        self, pos_to_piece_map: Dict[Position, Piece], sync_planes: bool = True
+    ):
         """
         Parameters
         ----------
         pos_to_piece_map: dict,
             the dictionary with positions as keys and the pieces as values.
+        sync_planes: bool,
+            whether the board's integer planes need to be updated as well.
         """
         for pos, piece in pos_to_piece_map.items():
             if piece is not None:
                 piece.change_position(pos)
-            self.board[pos] = piece
+            self.board.set_field(pos.coords, piece, sync_planes)
         self._status_checked = False
         return
 
+    def get_info_state(self, team: Team) -> "InfoState":
+        """
+        The state as seen by the given team, i.e. with the hidden enemy pieces unknown.
+        """
+        return InfoState(self, team)
+
     @staticmethod
     def _relate_piece_to_identifier(board: Board):
         piece_by_id = dict()
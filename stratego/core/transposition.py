@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from enum import Enum
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class Bound(Enum):
+    exact = 0
+    lower = 1
+    upper = 2
+
+
+class TranspositionTable:
+    """
+    A fixed size cache of search results, keyed by the Zobrist hash of a state (see State.__hash__).
+
+    Each slot holds the full key (to detect index collisions), the search depth, the value, the
+    kind of bound the value represents and the index of the best move found. Slots are addressed
+    by the lowest bits of the key and replaced if the new entry was searched at least as deep.
+    The best move of a shallower iteration serves the move ordering of iterative deepening.
+    """
+
+    entry_dtype = np.dtype(
+        [("key", "u8"), ("depth", "i1"), ("value", "f4"), ("flag", "u1"), ("best", "u4")]
+    )
+
+    def __init__(self, size: int = 1 << 20):
+        assert size > 0 and size & (size - 1) == 0, "'size' needs to be a power of 2."
+        self.slots = np.empty(size, dtype=self.entry_dtype)
+        self._mask = size - 1
+        self.clear()
+
+    def __len__(self):
+        return self.slots.shape[0]
+
+    def clear(self):
+        self.slots.fill(0)
+        # a negative depth marks an empty slot
+        self.slots["depth"] = -1
+
+    def probe(self, key: int) -> Optional[Tuple[int, float, Bound, int]]:
+        """
+        Look up the entry for the given key.
+
+        Returns
+        -------
+        Optional[tuple],
+            the depth, value, bound and best move index of the stored entry,
+            or None if there is no entry for this key.
+        """
+        slot = self.slots[key & self._mask]
+        if slot["depth"] < 0 or slot["key"] != key:
+            return None
+        return int(slot["depth"]), float(slot["value"]), Bound(slot["flag"]), int(slot["best"])
+
+    def store(self, key: int, depth: int, value: float, flag: Bound, best: int):
+        """
+        Store a search result, unless its slot holds a deeper result (of any key).
+        """
+        idx = key & self._mask
+        if self.slots[idx]["depth"] > depth:
+            return
+        self.slots[idx] = (key, depth, value, flag.value, best)
+
+
+class KillerMoves:
+    """
+    The most recent moves (as move indices) per ply that caused a beta-cutoff.
+    Searching them first at the same ply of a sibling node tends to produce the cutoff early.
+    """
+
+    # marks an empty entry
+    empty = np.iinfo(np.uint32).max
+
+    def __init__(self, max_ply: int, n_killers: int = 2):
+        self.moves = np.full((max_ply, n_killers), self.empty, dtype=np.uint32)
+
+    def clear(self):
+        self.moves.fill(self.empty)
+
+    def __getitem__(self, ply: int) -> np.ndarray:
+        killers = self.moves[ply]
+        return killers[killers != self.empty]
+
+    def store(self, ply: int, move_index: int):
+        killers = self.moves[ply]
+        if killers[0] != move_index:
+            # the previous killers are shifted back, the oldest one is dropped
+            killers[1:] = killers[:-1]
+            killers[0] = move_index
@@ -1,9 +1,11 @@
+from __future__ import annotations
+
 from stratego.learning import RewardToken
 from stratego.core.piece import Piece, Obstacle
 from stratego.agent import Agent, RLAgent
 from stratego.core.state import State
 from stratego.core.logic import Logic
-from stratego.core.position import Position, Move
+from stratego.core.position import Move
 from stratego.core.board import Board
 from stratego.core.game_defs import Status, Team, HookPoint, GameSpecification
 from stratego.utils import slice_kwargs
@@ -11,12 +13,18 @@ from stratego.utils import slice_kwargs
 from typing import Optional, Dict, List, Sequence, Callable, Iterable, Union, Tuple
 import numpy as np
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import itertools
+import os
 
 import matplotlib.pyplot as plt
 
 
 class Game:
+
+    # the reward of the attacking agent, indexed by the fight outcome + 1 (loss, tie, win)
+    fight_rewards = (RewardToken.die, RewardToken.kill_mutually, RewardToken.kill)
+
     def __init__(
         self,
         agent0: Agent,
@@ -31,11 +39,16 @@ class Game:
             Team(agent0.team): agent0,
             Team(agent1.team): agent1,
         }
+        # the agents indexed by the team value, for the cheap lookup in every step
+        self._agents_by_value: Tuple[Agent, Agent] = (
+            self.agents[Team.blue],
+            self.agents[Team.red],
+        )
         self.hook_handler: Dict[HookPoint, List[Callable]] = defaultdict(list)
         self._gather_hooks(agents=(agent0, agent1))
         self.fixed_setups: Dict[Team, Optional[Sequence[Piece]]] = dict()
         for team in Team:
-            if setup := fixed_setups[team.value] is not None:
+            if (setup := fixed_setups[team.value]) is not None:
                 self.fixed_setups[team] = tuple(setup)
             else:
                 self.fixed_setups[team] = None
@@ -43,12 +56,14 @@ class Game:
         self.specs: GameSpecification = GameSpecification(game_size)
 
         self.rng_state = np.random.default_rng(seed)
+        # the board reused by every reset, allocated on the first one
+        self._board_buffer: Optional[Board] = None
         self.logic = logic
         self.state: State
         if state is not None:
             self.state = state
             self.state.dead_pieces = logic.compute_dead_pieces(
-                state.board, self.specs.token_count
+                state.board, self.specs.token_count_array
             )
         else:
             self.reset()
@@ -63,7 +78,7 @@ class Game:
         )
 
     def __hash__(self):
-        return hash(str(self))
+        return hash(self.state)
 
     def _gather_hooks(self, agents: Iterable[Agent]):
         for agent in agents:
@@ -71,8 +86,17 @@ class Game:
                 self.hook_handler[hook_point].extend(hooks)
 
     def reset(self):
+        """
+        Start a new game on a newly drawn board.
+        The board of the previous state is reused for this, so a state, which needs to outlive
+        the reset, has to be copied beforehand.
+        """
+        if self._board_buffer is None:
+            self._board_buffer = Board(
+                np.empty((self.specs.game_size, self.specs.game_size), dtype=object)
+            )
         self.state = State(
-            Board(self.draw_board()),
+            self.draw_board(out=self._board_buffer),
             starting_team=self.rng_state.choice([Team.blue, Team.red]),
         )
         return self
@@ -121,6 +145,50 @@ class Game:
 
         return status
 
+    @classmethod
+    def run_many(
+        cls,
+        factory: Callable[[Optional[int]], Game],
+        n: int,
+        seeds: Optional[Sequence[Optional[int]]] = None,
+        workers: Optional[int] = os.cpu_count(),
+        **kwargs,
+    ) -> List[Status]:
+        """
+        Run n independent games in parallel worker processes.
+
+        Parameters
+        ----------
+        factory: Callable,
+            constructs the game to run from a seed. Needs to be picklable (e.g. a module level
+            function or a functools.partial of one), since every worker builds its own game.
+        n: int,
+            the number of games to run.
+        seeds: Sequence (optional),
+            the seed passed to the factory for each game. Defaults to no seeds.
+        workers: int (optional),
+            the number of worker processes. Defaults to the number of cpus.
+            With a single worker the games are run in the current process.
+        kwargs: dict,
+            the keyword arguments forwarded to each 'run_game' call.
+
+        Returns
+        -------
+        List[Status],
+            the final status of each game, in the order of the seeds.
+        """
+        if seeds is None:
+            seeds = [None] * n
+        assert len(seeds) == n, "A seed needs to be given for each of the n games."
+        if workers == 1:
+            return [_run_game(factory, seed, kwargs) for seed in seeds]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(
+                executor.map(
+                    _run_game, itertools.repeat(factory), seeds, itertools.repeat(kwargs)
+                )
+            )
+
     def run_step(self, move: Optional[Move] = None) -> Status:
         """
         Execute one step of the core (i.e. the action decided by the active player).
@@ -136,7 +204,7 @@ class Game:
             the current status of the core.
         """
         player = self.state.active_team
-        agent = self.agents[player]
+        agent = self._agents_by_value[player.value]
 
         self._trigger_hooks(HookPoint.pre_move_decision, self.state)
 
@@ -168,12 +236,7 @@ class Game:
         )
 
         if fight_status is not None:
-            if fight_status == 1:
-                self.reward_agent(agent, RewardToken.kill)
-            elif fight_status == -1:
-                self.reward_agent(agent, RewardToken.die)
-            else:
-                self.reward_agent(agent, RewardToken.kill_mutually)
+            self.reward_agent(agent, self.fight_rewards[fight_status + 1])
 
         # test if game is over
         if (status := self.logic.get_status(self.state, specs=self.specs)) != Status.ongoing:
@@ -185,56 +248,41 @@ class Game:
         for hook in self.hook_handler[hook_point]:
             hook(*args, **kwargs)
 
-    def draw_board(self):
+    def draw_board(self, out: Optional[Board] = None):
         """
         Draw a random board according to the current core specification.
 
+        Parameters
+        ----------
+        out: Board (optional),
+            the board to draw the setup onto. It is cleared first. A new board is created if not given.
+
         Returns
         -------
-        np.ndarray,
+        Board,
             the setup, in numpy array form
         """
         rng = self.rng_state
 
-        board = Board(
-            np.empty((self.specs.game_size, self.specs.game_size), dtype=object)
-        )  # inits all entries to None
+        if out is None:
+            board = Board(
+                np.empty((self.specs.game_size, self.specs.game_size), dtype=object)
+            )  # inits all entries to None
+        else:
+            board = out
+            board.clear()
         for team in Team:
-            token_count = self.specs.token_count
-            all_tokens = list(token_count.keys())
-            token_freqs = list(token_count.values())
-
             if (setup := self.fixed_setups[team]) is not None:
+                # the fixed setup is reused on every reset, so the pieces are not to be altered
                 for piece in setup:
-                    board[piece.position] = piece
+                    board[piece.position] = piece.clone()
             else:
-                setup_rows = self.specs.setup_rows[team]
-
-                all_pos = [
-                    Position(r, c)
-                    for r, c in itertools.product(
-                        setup_rows, range(self.specs.game_size)
-                    )
-                ]
-
-                while all_pos:
-
-                    token_draw = rng.choice(
-                        np.arange(len(all_tokens)),
-                        p=list(map(lambda x: x / sum(token_freqs), token_freqs)),
-                    )
-                    token = all_tokens[token_draw]
-                    version = token_freqs[token_draw]
-                    token_freqs[token_draw] -= 1
-                    if token_freqs[token_draw] == 0:
-                        # if no such token is left to be drawn, then remove it from the token list
-                        all_tokens.pop(token_draw)
-                        token_freqs.pop(token_draw)
-
-                    pos_draw = rng.choice(np.arange(len(all_pos)))
-                    pos = all_pos[pos_draw]
-                    all_pos.pop(pos_draw)
-
+                all_pos = self.specs.setup_positions[team]
+                # a single permutation of the setup positions places every piece on a random field.
+                for pos_idx, (token, version) in zip(
+                    rng.permutation(len(all_pos)), self.specs.setup_pieces
+                ):
+                    pos = all_pos[pos_idx]
                     board[pos] = Piece(pos, team, token, version)
 
         for obs_pos in self.specs.obstacle_positions:
@@ -246,3 +294,8 @@ class Game:
     def reward_agent(agent: Agent, reward: RewardToken):
         if isinstance(agent, RLAgent):
             agent.add_reward(reward)
+
+
+def _run_game(factory: Callable[[Optional[int]], Game], seed: Optional[int], kwargs: Dict):
+    # module level, so that the process pool can pickle it
+    return factory(seed).run_game(**kwargs)
@@ -1,5 +1,6 @@
 from abc import ABC
 from copy import deepcopy
+from typing import Callable, Optional, Union
 
 import numpy as np
 import torch
@@ -10,17 +11,175 @@ import os
 
 class Network(torch.nn.Module, ABC):
 
-    @torch.no_grad()
-    def predict(self, board):
+    # whether 'predict' runs through a frozen TorchScript trace of the network
+    jit_inference: bool = True
+    # whether predictions on cuda replay a captured CUDA graph per input shape
+    cuda_graphs: bool = True
+    # the torch.compile mode (e.g. 'max-autotune') to run 'predict' with instead of the trace.
+    # Compiling takes long, but specializes the kernels to the board shape.
+    compile_mode: Optional[str] = None
+
+    def to(self, *args, **kwargs):
+        # convolutions run fastest on channels last (NHWC) data, the inputs are converted to match.
+        # This only affects the 4D convolution weights.
+        kwargs.setdefault("memory_format", torch.channels_last)
+        self._invalidate_inference()
+        return super().to(*args, **kwargs)
+
+    def train(self, mode: bool = True):
+        if mode:
+            # the weights are about to change
+            self._invalidate_inference()
+        return super().train(mode)
+
+    def load_state_dict(self, *args, **kwargs):
+        self._invalidate_inference()
+        return super().load_state_dict(*args, **kwargs)
+
+    def __getstate__(self):
+        # the traced module can't be pickled (e.g. for worker processes) and is rebuilt on demand
+        state = self.__dict__.copy()
+        state["_inference_module"] = None
+        state["_cuda_graphs"] = dict()
+        state["_host_staging"] = dict()
+        state["_compiled_module"] = None
+        return state
+
+    def _invalidate_inference(self):
+        # stored in the instance dict, so that the traced copy is not registered as a submodule
+        self.__dict__["_inference_module"] = None
+        self.__dict__["_cuda_graphs"] = dict()
+
+    def _inference(self, board: torch.Tensor) -> torch.nn.Module:
         """
-        board: np array with board
+        The module to run predictions with. The traced module is frozen, i.e. the weights are
+        folded in as constants, hence it is rebuilt whenever the weights may have changed.
+
+        On cuda the frozen graph is additionally optimized for inference, which fuses each
+        convolution with its bias and the following ReLU into a single cuDNN kernel. On the cpu
+        this pass converts the activations to (and from) the MKLDNN layout, which costs more
+        than it saves on the small board sizes.
         """
-        self.eval()
-        pi, v = self(board)
+        if self.compile_mode is not None:
+            # the compiled module reads the current weights, hence is kept across weight updates
+            if self.__dict__.get("_compiled_module") is None:
+                self.__dict__["_compiled_module"] = torch.compile(
+                    self, mode=self.compile_mode, fullgraph=True, dynamic=False
+                )
+            return self.__dict__["_compiled_module"]
+        if not self.jit_inference:
+            return self
+        if self.__dict__.get("_inference_module") is None:
+            traced = torch.jit.trace(self.eval(), board)
+            if board.is_cuda:
+                module = torch.jit.optimize_for_inference(traced)
+            else:
+                module = torch.jit.freeze(traced)
+            self.__dict__["_inference_module"] = module
+        return self.__dict__["_inference_module"]
+
+    @staticmethod
+    def to_channels_last(board: torch.Tensor) -> torch.Tensor:
+        if board.dim() == 4:
+            return board.contiguous(memory_format=torch.channels_last)
+        return board
+
+    def _graphed_inference(self, boards: torch.Tensor):
+        """
+        Run the inference module by replaying a CUDA graph captured for the shape of the boards.
+        The whole sequence of kernels is launched by a single call, which removes the launch
+        overhead dominating small batches. The outputs are static tensors, overwritten by the
+        next replay.
+        """
+        graphs = self.__dict__.setdefault("_cuda_graphs", dict())
+        if (key := tuple(boards.shape)) not in graphs:
+            module = self._inference(boards)
+            static_in = boards.clone()
+            # warm up on a side stream, as required before capturing
+            stream = torch.cuda.Stream()
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream):
+                for _ in range(3):
+                    module(static_in)
+            torch.cuda.current_stream().wait_stream(stream)
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph):
+                static_pi, static_v = module(static_in)
+            graphs[key] = graph, static_in, static_pi, static_v
+        graph, static_in, static_pi, static_v = graphs[key]
+        static_in.copy_(boards)
+        graph.replay()
+        return static_pi, static_v
+
+    def _to_host(self, pi: torch.Tensor, v: torch.Tensor):
+        """
+        Copy the policies and values off the gpu with a single synchronization.
 
-        return torch.exp(pi).data.cpu().numpy()[0], v.data.cpu().numpy()[0]
+        Both are written into one pinned host buffer (reused per output shape), which lets the
+        copy run asynchronously, and only then the stream is waited on once.
+        """
+        out = torch.cat((torch.exp(pi), v), dim=1)
+        staging = self.__dict__.setdefault("_host_staging", dict())
+        if (key := tuple(out.shape)) not in staging:
+            staging[key] = torch.empty(key, dtype=out.dtype, pin_memory=True)
+        host = staging[key]
+        host.copy_(out, non_blocking=True)
+        torch.cuda.current_stream(out.device).synchronize()
+        # the buffer is overwritten by the next prediction
+        host = host.numpy().copy()
+        return host[:, :-1], host[:, -1:]
+
+    @torch.inference_mode()
+    def predict_batch(self, boards: Union[np.ndarray, torch.Tensor]):
+        """
+        Predict the policies and values of a stack of boards in a single forward pass.
+
+        Parameters
+        ----------
+        boards: np.ndarray or torch.Tensor,
+            the board representations stacked to shape [N, C, H, W].
 
-    def save_checkpoint(self, folder="checkpoint", filename="checkpoint.pth.tar"):
+        Returns
+        -------
+        tuple,
+            the policies as [N, A] array and the values as [N, 1] array.
+        """
+        if self.training:
+            # the network stays in eval mode between training runs, hence this rarely walks
+            # the module tree
+            self.eval()
+        device = next(self.parameters()).device
+        boards = self.to_channels_last(
+            torch.as_tensor(boards, dtype=torch.float32).to(device, non_blocking=True)
+        )
+        # torch.compile captures its own CUDA graphs (in mode 'reduce-overhead')
+        if self.cuda_graphs and self.compile_mode is None and boards.is_cuda:
+            pi, v = self._graphed_inference(boards)
+        else:
+            pi, v = self._inference(boards)(boards)
+
+        if pi.is_cuda:
+            return self._to_host(pi, v)
+        return torch.exp(pi).numpy(), v.numpy()
+
+    def predict(self, board):
+        """
+        board: the representation of a single board, of shape [1, C, H, W]
+        """
+        pi, v = self.predict_batch(board)
+        return pi[0], v[0]
+
+    def save_checkpoint(
+        self,
+        folder="checkpoint",
+        filename="checkpoint.pth.tar",
+        half_precision: bool = False,
+    ):
+        """
+        With 'half_precision', the floating point tensors are stored as float16, which halves
+        the file size and the load time. This loses precision, hence it is meant for the
+        checkpoints of finished models, not for the weights training continues from.
+        """
         filepath = os.path.join(folder, filename)
         if not os.path.exists(folder):
             print(
@@ -29,21 +188,53 @@ class Network(torch.nn.Module, ABC):
                 )
             )
             os.mkdir(folder)
+        state_dict = self.state_dict()
+        if half_precision:
+            state_dict = {
+                key: tensor.detach().to("cpu", torch.float16)
+                if tensor.is_floating_point()
+                else tensor
+                for key, tensor in state_dict.items()
+            }
         torch.save(
             {
-                "state_dict": self.state_dict(),
+                "state_dict": state_dict,
             },
             filepath,
         )
 
     def load_checkpoint(
-        self, folder="checkpoint", filename="checkpoint.pth.tar", device: str = "cpu"
+        self,
+        folder="checkpoint",
+        filename="checkpoint.pth.tar",
+        device: Optional[str] = None,
     ):
+        """
+        Load the weights of a checkpoint into the network. The tensors are loaded onto 'device',
+        which defaults to the device of the network, and then copied into the parameters.
+        """
         filepath = os.path.join(folder, filename)
         if not os.path.exists(filepath):
             raise ValueError("No model in path {}".format(filepath))
-        checkpoint = torch.load(filepath, map_location=device)
-        self.load_state_dict(checkpoint["state_dict"])
+        param = next(self.parameters())
+        # the storages are memory mapped and only paged in when read, while the restricted
+        # unpickler accepts nothing but tensors and plain containers
+        checkpoint = torch.load(
+            filepath,
+            map_location=device if device is not None else param.device,
+            mmap=True,
+            weights_only=True,
+        )
+        state_dict = checkpoint["state_dict"]
+        # half precision checkpoints are cast back to the precision of the model
+        state_dict = {
+            key: tensor.to(param.dtype) if tensor.dtype == torch.float16 else tensor
+            for key, tensor in state_dict.items()
+        }
+        # the tensors are copied (not assigned), since the mapped storages are views of the
+        # file, which is invalidated once a checkpoint is saved to the same path
+        self.load_state_dict(state_dict)
+        self.eval()
 
 
 class Conv(nn.Module):
@@ -62,34 +253,33 @@ class Conv(nn.Module):
         super().__init__()
         self.nr_conv_layers = len(filter_amounts)
 
-        if isinstance(dropout_prob_per_layer, int):
-            self.dropout_prob_per_layer = dropout_prob_per_layer * np.ones(
-                self.nr_conv_layers
-            )
-        elif isinstance(dropout_prob_per_layer, np.ndarray):
-            self.dropout_prob_per_layer = dropout_prob_per_layer
-        elif dropout_prob_per_layer is None:
-            self.dropout_prob_per_layer = np.zeros(self.nr_conv_layers)
+        # the layer parameters are kept as plain python numbers, which torch expects
+        if dropout_prob_per_layer is None:
+            self.dropout_prob_per_layer = [0.0] * self.nr_conv_layers
+        elif isinstance(dropout_prob_per_layer, (int, float)):
+            self.dropout_prob_per_layer = [
+                float(dropout_prob_per_layer)
+            ] * self.nr_conv_layers
+        else:
+            self.dropout_prob_per_layer = list(map(float, dropout_prob_per_layer))
 
         if maxpool_layer_pos is None:
-            self.maxpool_layer_pos = np.zeros(self.nr_conv_layers)
+            self.maxpool_layer_pos = [False] * self.nr_conv_layers
         else:
-            self.maxpool_layer_pos = np.array(maxpool_layer_pos)
+            self.maxpool_layer_pos = list(map(bool, maxpool_layer_pos))
 
         if kernel_sizes is None:
-            kernel_sizes = 3 * np.ones(self.nr_conv_layers)
+            kernel_sizes = [3] * self.nr_conv_layers
         else:
+            kernel_sizes = list(map(int, kernel_sizes))
             # all kernel sizes should be odd numbers
-            assert np.sum(kernel_sizes % 2) == self.nr_conv_layers
+            assert all(k % 2 == 1 for k in kernel_sizes)
 
-        # calculate the zero padding for each filter size
-        zero_paddings = np.zeros(self.nr_conv_layers, dtype=int)
-        for idx, kernel_size in enumerate(kernel_sizes):
-            zero_paddings[idx] = (kernel_size - 1) / 2
+        # the zero padding for each filter size, which keeps the spatial dimensions
+        zero_paddings = [(kernel_size - 1) // 2 for kernel_size in kernel_sizes]
 
         self.conv_layers = nn.ModuleList()
-        # this conversion needs to happen because of some internal torch problem with numpy.int.32
-        filter_amounts = [channels_in] + list(map(int, filter_amounts))
+        filter_amounts = [int(channels_in)] + list(map(int, filter_amounts))
 
         for k in range(self.nr_conv_layers):
             self.conv_layers.extend(
@@ -100,25 +290,48 @@ class Conv(nn.Module):
                         kernel_size=kernel_sizes[k],
                         padding=zero_paddings[k],
                     ),
-                    nn.ReLU(),
+                    # the convolution's backward pass doesn't need its output
+                    nn.ReLU(inplace=True),
                 ]
             )
-            if self.maxpool_layer_pos[k] == 1:
+            if self.maxpool_layer_pos[k]:
                 self.conv_layers.extend([nn.MaxPool2d(kernel_size=3, stride=2)])
             if self.dropout_prob_per_layer[k] > 0:
+                # the ReLU's backward pass needs its output unchanged
                 self.conv_layers.extend(
-                    [nn.Dropout2d(p=self.dropout_prob_per_layer[k])]
+                    [
+                        nn.Dropout2d(
+                            p=self.dropout_prob_per_layer[k],
+                            inplace=self.maxpool_layer_pos[k],
+                        )
+                    ]
                 )
+        # a sequential runs the layers in a single call (with the same state dict keys)
+        self.conv_layers = nn.Sequential(*self.conv_layers)
 
     def forward(self, x):
-        for layer in self.conv_layers:
-            x = layer(x)
-        return x
+        return self.conv_layers(x)
+
+
+class _Activation(nn.Module):
+    """
+    Module wrapper of an activation function, so that it can be chained in a nn.Sequential.
+    """
+
+    def __init__(self, function: Callable[[torch.Tensor], torch.Tensor]):
+        super().__init__()
+        self.function = function
+
+    def forward(self, x):
+        return self.function(x)
 
 
 class FC(nn.Module):
     """
     Convenience class to create a chain of fully connected layers
+
+    The activation function, applied after each hidden layer, may be a module
+    (e.g. nn.ReLU()) or any callable on tensors (e.g. F.relu).
     """
 
     def __init__(
@@ -127,40 +340,50 @@ class FC(nn.Module):
         dim_out: int,
         nr_lin_layers: int,
         start_layer_exponent: int = 8,
-        activation_function: torch.nn.functional = nn.ReLU(),
+        activation_function: Union[nn.Module, Callable] = nn.ReLU(inplace=True),
         device: str = "cpu",
     ):
         super().__init__()
         self.dim_input = dim_in
         self.dim_output = dim_out
         self.start_layer_exponent = start_layer_exponent
-        self.hidden_nodes = 2 ** start_layer_exponent
+        self.hidden_nodes = 1 << start_layer_exponent
         self.nr_lin_layers = nr_lin_layers
-        self.linear_layers: nn.ModuleList = nn.ModuleList(
-            [nn.Linear(self.dim_input, self.hidden_nodes)]
+        # the hidden widths halve from layer to layer, starting at 'hidden_nodes'
+        self.widths = (
+            [self.dim_input]
+            + [max(self.hidden_nodes >> i, 1) for i in range(self.nr_lin_layers - 1)]
+            + [self.dim_output]
         )
-        for i in range(self.nr_lin_layers - 2):
-            denom_in = 2 ** i
-            denom_out = 2 ** (i + 1)
-            self.linear_layers.extend(
-                [nn.Linear(self.hidden_nodes / denom_in, self.hidden_nodes / denom_out)]
-            )
-
-        self.linear_layers.extend(
+        self.linear_layers: nn.ModuleList = nn.ModuleList(
             [
-                nn.Linear(
-                    self.hidden_nodes / (2 ** (self.nr_lin_layers - 2)), self.dim_output
-                )
+                nn.Linear(width_in, width_out)
+                for width_in, width_out in zip(self.widths[:-1], self.widths[1:])
             ]
         )
+        if not isinstance(activation_function, nn.Module):
+            activation_function = _Activation(activation_function)
         self.activation = activation_function
+        # the hidden layers, each followed by the activation, and the output layer
+        self.body = nn.Sequential(
+            *(nn.Sequential(layer, self.activation) for layer in self.linear_layers[:-1])
+        )
+        self.head = self.linear_layers[-1]
+        del self.linear_layers
+        self._register_load_state_dict_pre_hook(self._map_linear_layers_keys)
         self.to(device)
 
+    def _map_linear_layers_keys(self, state_dict, prefix, *args):
+        # translate the keys of checkpoints, which stored the layers in a 'linear_layers' list
+        n_hidden = len(self.body)
+        for key in [key for key in state_dict if key.startswith(prefix + "linear_layers.")]:
+            idx, param = key[len(prefix + "linear_layers.") :].split(".", 1)
+            idx = int(idx)
+            new_key = f"body.{idx}.0.{param}" if idx < n_hidden else f"head.{param}"
+            state_dict[prefix + new_key] = state_dict.pop(key)
+
     def forward(self, x):
-        for lin_layer in self.linear_layers[:-1]:
-            x = self.activation(lin_layer(x))
-        x = self.linear_layers[-1](x)
-        return x
+        return self.head(self.body(x))
 
 
 class PolicyValueNet(Network):
@@ -188,15 +411,18 @@ class PolicyValueNet(Network):
         output_per_layer = []
         for layer in self.conv_net.conv_layers:
             x = layer(x)
-            output_per_layer.append(x)
-        for layer in self.fc_net.linear_layers:
-            x = self.fc_net.activation(layer(x))
+            # the following in-place activation (or dropout) would overwrite the recorded output
+            output_per_layer.append(x.clone())
+        x = x.reshape(-1, self.fc_net.dim_input)
+        for layer in (*self.fc_net.body, self.fc_net.head):
+            x = layer(x)
             output_per_layer.append(x)
         return params, output_per_layer
 
     def forward(self, x):
         x = self.conv_net(x)
-        x = x.view(-1, self.fc_net.dim_input)
+        # reshape, since channels last features are not contiguous in the flattened order
+        x = x.reshape(-1, self.fc_net.dim_input)
         x = self.fc_net(x)
 
         pi = self.policy_layer(x)  # batch_size x action_size
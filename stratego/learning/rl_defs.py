@@ -21,6 +21,13 @@ class RewardToken(Enum):
     die = 5  # lose to enemy piece
     kill_mutually = 6  # mutual annihilation of attacking and defending piece
 
+    def __int__(self):
+        return self.value
+
+    def __index__(self):
+        # allows indexing reward arrays by reward tokens
+        return self.value
+
 
 class PolicyMode(Enum):
     stochastic = 0
@@ -138,11 +138,11 @@ class RollingMeter(object):
 
     def push(self, val, n=1):
         self.val = val
-        self.avg = self.sum / self.count
         self.sum += val * n
         self.max = max(self.max, val)
         self.min = min(self.min, val)
         self.count += n
+        self.avg = self.sum / self.count
 
 
 class SumTree:
@@ -3,14 +3,24 @@ from stratego.core import (
     State,
     Status,
     Position,
+    Move,
     Piece,
     Team,
     Token,
     Board,
     BattleMatrix,
     ActionMap,
+    TranspositionTable,
+    Bound,
 )
+from stratego.game import Game
+from stratego.learning.networks import FC
+from stratego.agent import RandomAgent
+from copy import deepcopy
+
 import numpy as np
+import torch
+import torch.nn.functional as F
 from build_board import minimal_state, minimal_state2
 
 
@@ -28,6 +38,130 @@ def test_logic():
     x = 3
 
 
+def test_board_planes():
+    state = minimal_state()
+    board = state.board
+
+    assert board.tokens[0, 0] == Token.scout.value
+    assert board.teams[4, 4] == Team.red.value
+    assert board.tokens[2, 2] == Token.obstacle.value
+    assert board.teams[2, 2] == -1
+
+    assert board.fen() == "S4/1N3/2x2/3n1/4s"
+
+    state.update_board({Position(0, 0): None, Position(0, 1): board[0, 0]})
+    assert board.tokens[0, 0] == -1
+    assert board.tokens[0, 1] == Token.scout.value
+
+    flipped = np.flip(board)
+    assert flipped.tokens[4, 3] == Token.scout.value
+
+
+def test_execute_move():
+    state = minimal_state()
+    logic = Logic()
+    state.board[0, 3] = Piece((0, 3), Team.blue, Token.scout, version=2)
+
+    # blue scout attacks the red miner and loses
+    outcome = logic.execute_move(state, Move(Position(0, 3), Position(3, 3)))
+    assert outcome == -1
+    assert state.board[0, 3] is None
+    assert state.board.tokens[3, 3] == Token.miner.value
+    assert not state.board[3, 3].hidden
+    assert state.dead_pieces[Team.blue][Token.scout] == 1
+
+
+def test_undo_moves():
+    state = minimal_state()
+    logic = Logic()
+    tokens_before = state.board.tokens.copy()
+    hash_before = hash(state)
+    moves = [
+        Move(Position(1, 1), Position(1, 2)),
+        Move(Position(3, 3), Position(3, 2)),
+        Move(Position(0, 0), Position(4, 0)),
+        Move(Position(4, 4), Position(4, 0)),
+    ]
+    for move in moves:
+        state.history.commit_move(state.board, move, state.turn_counter)
+        logic.execute_move(state, move)
+
+    logic.undo_last_n_turns(state, len(moves))
+    assert (state.board.tokens == tokens_before).all()
+    assert state.turn_counter == 0
+    assert hash(state) == hash_before
+    assert state.board[0, 0].hidden and not state.board[0, 0].has_moved
+    assert state.dead_pieces[Team.blue].sum() == state.dead_pieces[Team.red].sum() == 0
+
+
+def test_history_snapshot():
+    state = minimal_state()
+    logic = Logic()
+    state.board[1, 2] = Piece((1, 2), Team.red, Token.bomb)
+    move = Move(Position(1, 1), Position(1, 2))
+    state.history.commit_move(state.board, move, state.turn_counter)
+    # the blue miner defuses the bomb
+    logic.execute_move(state, move)
+    assert state.board.tokens[1, 2] == Token.miner.value
+
+    _, _, (miner, bomb) = state.history.get_by_turn(0)
+    assert bomb.token == Token.bomb and bomb.team == Team.red
+    assert not bomb.can_move and bomb.hidden
+    assert miner.token == Token.miner and miner.can_move and not miner.has_moved
+
+
+def test_transposition_table():
+    tt = TranspositionTable(size=1 << 4)
+    key = hash(minimal_state())
+    assert tt.probe(key) is None
+    tt.store(key, 3, 0.5, Bound.exact, 7)
+    assert tt.probe(key) == (3, 0.5, Bound.exact, 7)
+    # shallower results don't replace deeper ones
+    tt.store(key, 1, -1.0, Bound.lower, 2)
+    assert tt.probe(key) == (3, 0.5, Bound.exact, 7)
+    # a different key in the same slot misses
+    other = key ^ (1 << 40)
+    assert tt.probe(other) is None
+    # and doesn't replace the deeper entry
+    tt.store(other, 0, 1.0, Bound.exact, 1)
+    assert tt.probe(other) is None
+    assert tt.probe(key) == (3, 0.5, Bound.exact, 7)
+    tt.store(other, 3, 1.0, Bound.upper, 1)
+    assert tt.probe(other) == (3, 1.0, Bound.upper, 1)
+    assert tt.probe(key) is None
+
+    # copies of a state share the table
+    state = minimal_state()
+    state.tt = tt
+    copied = deepcopy(state)
+    assert copied.tt is tt
+    assert copied.board is not state.board
+
+
+def test_fc_functional_activation():
+    x = torch.randn(4, 20)
+    fc = FC(20, 3, 3, start_layer_exponent=4, activation_function=F.relu)
+    module_fc = FC(20, 3, 3, start_layer_exponent=4, activation_function=torch.nn.ReLU())
+    module_fc.load_state_dict(fc.state_dict())
+    assert fc(x).shape == (4, 3)
+    assert torch.allclose(fc(x), module_fc(x))
+
 
+def random_game(seed: int):
+    # module level, so that the worker processes can unpickle it
+    return Game(
+        RandomAgent(Team.blue, seed=seed),
+        RandomAgent(Team.red, seed=seed + 1),
+        game_size="s",
+        seed=seed,
+    )
 
 
+def test_run_many():
+    seeds = [3, 1, 2, 0]
+    serial = Game.run_many(random_game, len(seeds), seeds=seeds, workers=1)
+    parallel = Game.run_many(random_game, len(seeds), seeds=seeds, workers=2)
+    assert all(status != Status.ongoing for status in serial)
+    # the results follow the order of the seeds, whichever worker ran the game
+    assert parallel == serial
+    assert serial == [random_game(seed).run_game() for seed in seeds]